@@ -4,16 +4,19 @@ Local GeoPulse Dashboard Test
 Run this locally to test without Docker
 """
 
+import importlib.util
 import subprocess
 import sys
 import os
 from pathlib import Path
 
 def install_requirements():
-    """Install required packages"""
+    """Install required packages that are not already importable"""
     packages = ['streamlit', 'pandas', 'plotly']
-    for package in packages:
-        subprocess.check_call([sys.executable, '-m', 'pip', 'install', package])
+    missing = [package for package in packages if importlib.util.find_spec(package) is None]
+    
+    if missing:
+        subprocess.check_call([sys.executable, '-m', 'pip', 'install', *missing])
 
 def main():
     print("🚀 Starting GeoPulse Local Test")
@@ -49,7 +52,7 @@ Giovanni Rossi,Italy,Rome,2024-01-19"""
     
     # Try to install requirements
     try:
-        print("📦 Installing requirements...")
+        print("📦 Checking requirements...")
         install_requirements()
     except Exception as e:
         print(f"⚠️  Could not install packages: {e}")
@@ -9,6 +9,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 import io
+import hashlib
+from pandas.api.types import union_categoricals
 
 # Page configuration
 st.set_page_config(
@@ -43,6 +45,84 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Column mapping for flexibility (every accepted alias -> standard name)
+COLUMN_MAPPING = {
+    'name': 'name', 'client_name': 'name', 'customer_name': 'name', 'full_name': 'name',
+    'country': 'country', 'nation': 'country', 'country_name': 'country',
+    'city': 'city', 'location': 'city', 'city_name': 'city',
+    'date': 'date', 'timestamp': 'date', 'created_date': 'date', 'entry_date': 'date'
+}
+REQUIRED_COLS = ['name', 'country', 'city', 'date']
+
+def standardize_columns(df):
+    """Lower-case column names and map the first alias found onto each standard name"""
+    df.columns = df.columns.str.lower().str.strip()
+    renames = {}
+    seen = set(df.columns)
+    for col in df.columns:
+        target = COLUMN_MAPPING.get(col)
+        if target is not None and target not in seen:
+            renames[col] = target
+            seen.add(target)
+    return df.rename(columns=renames)
+
+# Rows parsed per chunk so large uploads are never held in memory as a whole
+CSV_CHUNK_SIZE = 50_000
+
+# Low-cardinality columns stored as categoricals (integer codes instead of strings)
+CATEGORY_COLS = ['country', 'city']
+
+def to_category(series):
+    """Cast to category with string categories so chunks and files can be unioned"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and series.cat.categories.dtype == object:
+        return series
+    return series.astype(str).astype('category')
+
+def concat_categorical(frames, columns):
+    """Concatenate frames, keeping the given columns categorical across all of them"""
+    frames = list(frames)
+    for col in columns:
+        categories = union_categoricals([to_category(frame[col]) for frame in frames]).categories
+        dtype = pd.CategoricalDtype(categories)
+        frames = [frame.assign(**{col: frame[col].astype(dtype)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+def read_client_csv(source):
+    """Read a client CSV in chunks, keeping only the columns the dashboard uses"""
+    chunks = []
+    reader = pd.read_csv(
+        source,
+        chunksize=CSV_CHUNK_SIZE,
+        # Read as text so a chunk of numeric-looking cities (e.g. postcodes)
+        # gets the same categories as one with names
+        dtype=str,
+        usecols=lambda col: col.lower().strip() in COLUMN_MAPPING
+    )
+    
+    for chunk in reader:
+        # Standardize column names
+        chunk = standardize_columns(chunk)
+        
+        # Ensure required columns exist
+        missing_cols = [col for col in REQUIRED_COLS if col not in chunk.columns]
+        if missing_cols:
+            return pd.DataFrame(), missing_cols
+        
+        # Clean each chunk before it is kept
+        chunk['date'] = pd.to_datetime(chunk['date'], errors='coerce')
+        chunk = chunk.dropna(subset=['name', 'country', 'city'])
+        chunks.append(chunk.assign(**{col: to_category(chunk[col]) for col in CATEGORY_COLS}))
+    
+    if not chunks:
+        return pd.DataFrame(columns=REQUIRED_COLS), []
+    
+    return concat_categorical(chunks, CATEGORY_COLS), []
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_uploaded_file(data):
+    """Parse the raw bytes of an uploaded CSV (cached on file content across reruns)"""
+    return read_client_csv(io.BytesIO(data))
+
 def process_uploaded_files(uploaded_files):
     """Process uploaded CSV files"""
     all_data = []
@@ -51,36 +131,14 @@ def process_uploaded_files(uploaded_files):
     for uploaded_file in uploaded_files:
         try:
             # Read CSV from uploaded file
-            df = pd.read_csv(uploaded_file)
-            
-            # Standardize column names
-            df.columns = df.columns.str.lower().str.strip()
-            
-            # Column mapping for flexibility
-            column_mapping = {
-                'client_name': 'name', 'customer_name': 'name', 'full_name': 'name',
-                'nation': 'country', 'country_name': 'country',
-                'location': 'city', 'city_name': 'city',
-                'timestamp': 'date', 'created_date': 'date', 'entry_date': 'date'
-            }
-            df = df.rename(columns=column_mapping)
-            
-            # Ensure required columns exist
-            required_cols = ['name', 'country', 'city', 'date']
-            missing_cols = [col for col in required_cols if col not in df.columns]
+            df, missing_cols = parse_uploaded_file(uploaded_file.getvalue())
             
             if missing_cols:
                 st.error(f"❌ Missing columns in {uploaded_file.name}: {missing_cols}")
                 continue
             
-            # Clean and process data
-            df['date'] = pd.to_datetime(df['date'], errors='coerce')
-            df = df.dropna(subset=['name', 'country', 'city'])
+            # Tag rows with their origin
             df['source_file'] = uploaded_file.name
-            df['upload_time'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            
-            # Remove duplicates within this file
-            df = df.drop_duplicates(subset=['name', 'country', 'city'])
             
             all_data.append(df)
             file_info.append({
@@ -94,48 +152,74 @@ def process_uploaded_files(uploaded_files):
     
     if all_data:
         # Combine all data
-        combined_df = pd.concat(all_data, ignore_index=True)
+        combined_df = concat_categorical(all_data, CATEGORY_COLS + ['source_file'])
         # Remove duplicates across all files
         combined_df = combined_df.drop_duplicates(subset=['name', 'country', 'city'])
         return combined_df, file_info
     
     return pd.DataFrame(), []
 
+# Countries drawn on the world map (largest first), keeping the Plotly payload bounded
+MAP_TOP_COUNTRIES = 50
+
+# Country name -> ISO code lookup for the choropleth map
+COUNTRY_CODES = {
+    'United States': 'USA', 'United Kingdom': 'GBR', 'UK': 'GBR',
+    'Germany': 'DEU', 'France': 'FRA', 'Italy': 'ITA', 'Spain': 'ESP',
+    'Japan': 'JPN', 'China': 'CHN', 'India': 'IND', 'Brazil': 'BRA',
+    'Canada': 'CAN', 'Australia': 'AUS', 'Russia': 'RUS', 'Mexico': 'MEX',
+    'Argentina': 'ARG', 'South Korea': 'KOR', 'Netherlands': 'NLD',
+    'Switzerland': 'CHE', 'Sweden': 'SWE', 'Norway': 'NOR',
+    'Egypt': 'EGY', 'South Africa': 'ZAF', 'Kenya': 'KEN',
+    'Singapore': 'SGP', 'Thailand': 'THA', 'Vietnam': 'VNM',
+    'Poland': 'POL', 'Portugal': 'PRT', 'Greece': 'GRC',
+    'Ireland': 'IRL', 'Morocco': 'MAR', 'Chile': 'CHL',
+    'Peru': 'PER', 'Colombia': 'COL', 'Uruguay': 'URY',
+    'Ecuador': 'ECU', 'Bolivia': 'BOL', 'Venezuela': 'VEN',
+    'Paraguay': 'PRY', 'Guyana': 'GUY', 'Suriname': 'SUR',
+    'Panama': 'PAN', 'Costa Rica': 'CRI', 'Nicaragua': 'NIC',
+    'Honduras': 'HND', 'El Salvador': 'SLV', 'Guatemala': 'GTM',
+    'Belize': 'BLZ', 'Jamaica': 'JAM', 'Haiti': 'HTI',
+    'Dominican Republic': 'DOM', 'Cuba': 'CUB', 'Bahamas': 'BHS',
+    'Barbados': 'BRB', 'Trinidad and Tobago': 'TTO',
+    'Malta': 'MLT', 'Cyprus': 'CYP', 'Iceland': 'ISL',
+    'Finland': 'FIN', 'Estonia': 'EST', 'Latvia': 'LVA',
+    'Lithuania': 'LTU', 'Belarus': 'BLR', 'Ukraine': 'UKR',
+    'Moldova': 'MDA', 'Romania': 'ROU', 'Bulgaria': 'BGR',
+    'Serbia': 'SRB', 'Montenegro': 'MNE', 'Bosnia and Herzegovina': 'BIH',
+    'Croatia': 'HRV', 'Slovenia': 'SVN', 'New Zealand': 'NZL'
+}
+
 def get_country_code(country_name):
     """Map country names to ISO codes for choropleth map"""
-    country_codes = {
-        'United States': 'USA', 'United Kingdom': 'GBR', 'UK': 'GBR',
-        'Germany': 'DEU', 'France': 'FRA', 'Italy': 'ITA', 'Spain': 'ESP',
-        'Japan': 'JPN', 'China': 'CHN', 'India': 'IND', 'Brazil': 'BRA',
-        'Canada': 'CAN', 'Australia': 'AUS', 'Russia': 'RUS', 'Mexico': 'MEX',
-        'Argentina': 'ARG', 'South Korea': 'KOR', 'Netherlands': 'NLD',
-        'Switzerland': 'CHE', 'Sweden': 'SWE', 'Norway': 'NOR',
-        'Egypt': 'EGY', 'South Africa': 'ZAF', 'Kenya': 'KEN',
-        'Singapore': 'SGP', 'Thailand': 'THA', 'Vietnam': 'VNM',
-        'Poland': 'POL', 'Portugal': 'PRT', 'Greece': 'GRC',
-        'Ireland': 'IRL', 'Morocco': 'MAR', 'Chile': 'CHL',
-        'Peru': 'PER', 'Colombia': 'COL', 'Uruguay': 'URY',
-        'Ecuador': 'ECU', 'Bolivia': 'BOL', 'Venezuela': 'VEN',
-        'Paraguay': 'PRY', 'Guyana': 'GUY', 'Suriname': 'SUR',
-        'Panama': 'PAN', 'Costa Rica': 'CRI', 'Nicaragua': 'NIC',
-        'Honduras': 'HND', 'El Salvador': 'SLV', 'Guatemala': 'GTM',
-        'Belize': 'BLZ', 'Jamaica': 'JAM', 'Haiti': 'HTI',
-        'Dominican Republic': 'DOM', 'Cuba': 'CUB', 'Bahamas': 'BHS',
-        'Barbados': 'BRB', 'Trinidad and Tobago': 'TTO',
-        'Malta': 'MLT', 'Cyprus': 'CYP', 'Iceland': 'ISL',
-        'Finland': 'FIN', 'Estonia': 'EST', 'Latvia': 'LVA',
-        'Lithuania': 'LTU', 'Belarus': 'BLR', 'Ukraine': 'UKR',
-        'Moldova': 'MDA', 'Romania': 'ROU', 'Bulgaria': 'BGR',
-        'Serbia': 'SRB', 'Montenegro': 'MNE', 'Bosnia and Herzegovina': 'BIH',
-        'Croatia': 'HRV', 'Slovenia': 'SVN', 'New Zealand': 'NZL'
+    return COUNTRY_CODES.get(country_name, country_name[:3].upper())
+
+def hash_dataframe(df):
+    """Hash a DataFrame's full contents for st.cache_data keys"""
+    row_hashes = pd.util.hash_pandas_object(df, index=True).values
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).digest()
+
+# Streamlit's default hasher samples large frames and reduces categoricals to
+# their dtype name, so an edited upload could be served stale aggregates
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: hash_dataframe})
+def compute_aggregates(df):
+    """Compute country and city counts once per dataset for all views"""
+    by_country = df.groupby('country', sort=False, observed=True).size().sort_values(ascending=False)
+    by_country.index = by_country.index.astype(str)
+    by_city = df.groupby(['city', 'country'], sort=False, observed=True).size().reset_index(name='count')
+    by_city = by_city.astype({'city': str, 'country': str}).sort_values('count', ascending=False, kind='stable')
+    return {
+        'by_country': by_country,
+        'by_city': by_city,
+        'countries': sorted(by_country.index.tolist())
     }
-    return country_codes.get(country_name, country_name[:3].upper())
 
-def create_country_map(df):
+def create_country_map(by_country):
     """Create interactive world map"""
-    country_counts = df['country'].value_counts().reset_index()
+    country_counts = by_country.nlargest(MAP_TOP_COUNTRIES).reset_index()
     country_counts.columns = ['country', 'count']
-    country_counts['country_code'] = country_counts['country'].apply(get_country_code)
+    codes = country_counts['country'].map(COUNTRY_CODES)
+    country_counts['country_code'] = codes.fillna(country_counts['country'].str[:3].str.upper())
     
     fig = px.choropleth(
         country_counts,
@@ -149,13 +233,14 @@ def create_country_map(df):
     
     fig.update_layout(
         height=500,
+        hovermode='closest',
         coloraxis_colorbar=dict(title="Client Count"),
         geo=dict(showframe=False, showcoastlines=True)
     )
     
     return fig
 
-def show_country_distribution(df):
+def show_country_distribution(df, aggregates):
     """Display country distribution analysis"""
     st.header("🌍 Country Distribution Analysis")
     
@@ -168,15 +253,15 @@ def show_country_distribution(df):
     with col1:
         st.metric("Total Clients", len(df))
     with col2:
-        st.metric("Countries", df['country'].nunique())
+        st.metric("Countries", len(aggregates['by_country']))
     with col3:
-        st.metric("Cities", df['city'].nunique())
+        st.metric("Cities", aggregates['by_city']['city'].nunique())
     with col4:
         if 'source_file' in df.columns:
             st.metric("Data Files", df['source_file'].nunique())
     
     # World map
-    fig_map = create_country_map(df)
+    fig_map = create_country_map(aggregates['by_country'])
     st.plotly_chart(fig_map, use_container_width=True)
     
     # Country statistics
@@ -184,15 +269,15 @@ def show_country_distribution(df):
     
     with col1:
         st.subheader("📊 Top Countries")
-        country_stats = df['country'].value_counts().reset_index()
+        country_stats = aggregates['by_country'].head(10).reset_index()
         country_stats.columns = ['Country', 'Clients']
         country_stats['Percentage'] = (country_stats['Clients'] / len(df) * 100).round(1)
-        st.dataframe(country_stats.head(10), use_container_width=True)
+        st.dataframe(country_stats, use_container_width=True)
     
     with col2:
         # Horizontal bar chart
         fig_bar = px.bar(
-            country_stats.head(10),
+            country_stats,
             x='Clients',
             y='Country',
             orientation='h',
@@ -203,7 +288,7 @@ def show_country_distribution(df):
         fig_bar.update_layout(height=400, showlegend=False)
         st.plotly_chart(fig_bar, use_container_width=True)
 
-def show_city_analysis(df):
+def show_city_analysis(df, aggregates):
     """Display city analysis with filtering"""
     st.header("🏙️ City Analysis")
     
@@ -212,34 +297,35 @@ def show_city_analysis(df):
         return
     
     # Country filter
-    countries = ['All Countries'] + sorted(df['country'].unique().tolist())
+    countries = ['All Countries'] + aggregates['countries']
     selected_country = st.selectbox("🔍 Filter by Country:", countries)
     
     # Filter data based on selection
+    city_counts = aggregates['by_city']
     if selected_country == 'All Countries':
         filtered_df = df
         title_suffix = ""
     else:
         filtered_df = df[df['country'] == selected_country]
+        city_counts = city_counts[city_counts['country'] == selected_country]
         title_suffix = f" in {selected_country}"
     
     if filtered_df.empty:
         st.warning(f"No data available for {selected_country}")
         return
     
+    # City distribution
+    city_counts = city_counts.rename(columns={'city': 'City', 'country': 'Country', 'count': 'Clients'})
+    city_counts = city_counts.reset_index(drop=True)
+    
     # Filtered metrics
     col1, col2, col3 = st.columns(3)
     with col1:
         st.metric("Clients", len(filtered_df))
     with col2:
-        st.metric("Cities", filtered_df['city'].nunique())
+        st.metric("Cities", city_counts['City'].nunique())
     with col3:
-        st.metric("Countries", filtered_df['country'].nunique() if selected_country == 'All Countries' else 1)
-    
-    # City distribution
-    city_counts = filtered_df['city'].value_counts().reset_index()
-    city_counts.columns = ['City', 'Clients']
-    city_counts['Country'] = filtered_df.groupby('city')['country'].first().values
+        st.metric("Countries", city_counts['Country'].nunique() if selected_country == 'All Countries' else 1)
     
     col1, col2 = st.columns(2)
     
@@ -265,7 +351,7 @@ def show_city_analysis(df):
     # Recent entries
     if 'date' in filtered_df.columns:
         st.subheader("📅 Recent Client Entries")
-        recent_data = filtered_df.sort_values('date', ascending=False).head(10)
+        recent_data = filtered_df.nlargest(10, 'date')
         display_columns = ['name', 'country', 'city', 'date']
         if 'source_file' in recent_data.columns:
             display_columns.append('source_file')
@@ -328,6 +414,7 @@ def main():
         # Process uploaded files
         with st.spinner("🔄 Processing your data..."):
             df, file_info = process_uploaded_files(uploaded_files)
+            aggregates = compute_aggregates(df) if not df.empty else None
         
         if not df.empty:
             # Success message
@@ -345,9 +432,9 @@ def main():
             
             # Display selected view
             if selected_view == "🌍 Country Distribution":
-                show_country_distribution(df)
+                show_country_distribution(df, aggregates)
             else:
-                show_city_analysis(df)
+                show_city_analysis(df, aggregates)
             
         else:
             st.error("❌ No valid data found in uploaded files. Please check the format.")
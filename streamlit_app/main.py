@@ -7,9 +7,12 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
+from pyarrow import csv as pa_csv
 from pathlib import Path
+import os
 import time
 import glob
+import hashlib
 
 # Page configuration
 st.set_page_config(
@@ -37,75 +40,133 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data(ttl=10)  # Cache for 10 seconds for auto-refresh
-def load_data_from_csv():
-    """Load data from all CSV files in data/input directory"""
+# Column mapping for flexibility (every accepted alias -> standard name)
+COLUMN_MAPPING = {
+    'name': 'name', 'client_name': 'name', 'customer_name': 'name', 'full_name': 'name',
+    'country': 'country', 'nation': 'country', 'country_name': 'country',
+    'city': 'city', 'location': 'city', 'city_name': 'city',
+    'date': 'date', 'timestamp': 'date', 'created_date': 'date', 'entry_date': 'date'
+}
+REQUIRED_COLS = ['name', 'country', 'city', 'date']
+
+def standardize_columns(df):
+    """Lower-case column names and map the first alias found onto each standard name"""
+    df.columns = df.columns.str.lower().str.strip()
+    renames = {}
+    seen = set(df.columns)
+    for col in df.columns:
+        target = COLUMN_MAPPING.get(col)
+        if target is not None and target not in seen:
+            renames[col] = target
+            seen.add(target)
+    return df.rename(columns=renames)
+
+DATA_PATH = Path("data/input")
+
+# Same missing-value markers as pd.read_csv, so blank key cells are dropped as before
+CSV_CONVERT_OPTIONS = pa_csv.ConvertOptions(
+    strings_can_be_null=True,
+    null_values=[
+        '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan',
+        '1.#IND', '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None',
+        'n/a', 'nan', 'null'
+    ]
+)
+
+# Cache bounds: every file change produces new cache keys, so old entries must be evicted
+FILE_CACHE_ENTRIES = 128  # per-file loads (about 2x the files expected in data/input)
+DATASET_CACHE_ENTRIES = 2  # combined datasets (current and previous file set)
+CITY_STATS_CACHE_ENTRIES = 64  # per-country city stats across those datasets
+
+def get_input_files(data_path=DATA_PATH):
+    """List CSV files in the input directory as (path, mtime, size) tuples"""
+    try:
+        with os.scandir(data_path) as entries:
+            input_files = [
+                (entry.path, entry.stat().st_mtime, entry.stat().st_size)
+                for entry in entries
+                if entry.name.endswith('.csv') and entry.is_file()
+            ]
+    except FileNotFoundError:
+        return None
+    
+    return tuple(sorted(input_files))
+
+@st.fragment(run_every="10s")
+def watch_input_files(input_files):
+    """Rerun the dashboard when the CSV files in data/input change"""
+    if get_input_files() != input_files:
+        st.rerun()
+
+@st.cache_data(show_spinner=False, max_entries=FILE_CACHE_ENTRIES)
+def load_csv_file(path, mtime, size):
+    """Read and clean one CSV file (cached until its mtime or size changes)"""
+    # Arrow's parser types ISO dates itself; keep them as datetime64, not date objects
+    df = pa_csv.read_csv(path, convert_options=CSV_CONVERT_OPTIONS).to_pandas(date_as_object=False)
+    
+    # Standardize column names
+    df = standardize_columns(df)
+    
+    # Ensure required columns exist
+    missing_cols = [col for col in REQUIRED_COLS if col not in df.columns]
+    if missing_cols:
+        return pd.DataFrame(), missing_cols
+    
+    # Add file source
+    df['source_file'] = Path(path).name
+    
+    # Parse dates that were not already typed by the reader
+    if not pd.api.types.is_datetime64_any_dtype(df['date']):
+        df['date'] = pd.to_datetime(df['date'], errors='coerce', cache=True)
+    
+    # Clean data
+    df = df.dropna(subset=['name', 'country', 'city'])
+    
+    return df, []
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def load_data_from_csv(input_files):
+    """Load data from all CSV files in data/input directory, with per-file load info"""
     try:
-        data_path = Path("data/input")
-        if not data_path.exists():
+        if input_files is None:
             st.error("📁 data/input directory not found!")
-            return pd.DataFrame()
+            return pd.DataFrame(), pd.DataFrame()
         
-        # Find all CSV files
-        csv_files = list(data_path.glob("*.csv"))
-        
-        if not csv_files:
+        if not input_files:
             st.warning("📄 No CSV files found in data/input directory")
-            return pd.DataFrame()
+            return pd.DataFrame(), pd.DataFrame()
         
         # Read and combine all CSV files
         all_data = []
-        file_info = []
+        file_names, file_records, file_modified = [], [], []
         
-        for csv_file in csv_files:
+        for path, mtime, size in input_files:
+            file_name = Path(path).name
             try:
-                df = pd.read_csv(csv_file)
-                
-                # Standardize column names
-                df.columns = df.columns.str.lower().str.strip()
-                
-                # Ensure required columns exist
-                required_cols = ['name', 'country', 'city', 'date']
-                missing_cols = []
-                
-                for col in required_cols:
-                    if col not in df.columns:
-                        # Try to find similar column names
-                        found = False
-                        for df_col in df.columns:
-                            if col in df_col or df_col in col:
-                                df = df.rename(columns={df_col: col})
-                                found = True
-                                break
-                        if not found:
-                            missing_cols.append(col)
+                df, missing_cols = load_csv_file(path, mtime, size)
                 
                 if missing_cols:
-                    st.warning(f"⚠️ File {csv_file.name} missing columns: {missing_cols}")
+                    st.warning(f"⚠️ File {file_name} missing columns: {missing_cols}")
                     continue
                 
-                # Add file source
-                df['source_file'] = csv_file.name
-                df['file_modified'] = time.ctime(csv_file.stat().st_mtime)
-                
-                # Parse dates
-                df['date'] = pd.to_datetime(df['date'], errors='coerce')
-                
-                # Clean data
-                df = df.dropna(subset=['name', 'country', 'city'])
+                file_names.append(file_name)
+                file_records.append(len(df))
+                file_modified.append(time.ctime(mtime))
                 
                 all_data.append(df)
-                file_info.append({
-                    'file': csv_file.name,
-                    'records': len(df),
-                    'modified': time.ctime(csv_file.stat().st_mtime)
-                })
                 
             except Exception as e:
-                st.error(f"❌ Error reading {csv_file.name}: {e}")
+                st.error(f"❌ Error reading {file_name}: {e}")
+        
+        # Per-file summary, built once per file set for the sidebar
+        file_info_df = pd.DataFrame({
+            'file': file_names,
+            'records': file_records,
+            'modified': file_modified
+        })
         
         if not all_data:
-            return pd.DataFrame()
+            return pd.DataFrame(), file_info_df
         
         # Combine all data
         combined_df = pd.concat(all_data, ignore_index=True)
@@ -113,35 +174,136 @@ def load_data_from_csv():
         # Remove duplicates based on name, country, city
         combined_df = combined_df.drop_duplicates(subset=['name', 'country', 'city'])
         
-        # Store file info in session state
-        st.session_state.file_info = file_info
+        # Store low-cardinality columns as categoricals (integer codes)
+        for col in ('country', 'city', 'source_file'):
+            combined_df[col] = combined_df[col].astype('category')
         
-        return combined_df
+        # Overview metrics, computed once per file set instead of on every rerun
+        combined_df.attrs['n_countries'] = combined_df['country'].nunique()
+        combined_df.attrs['n_cities'] = combined_df['city'].nunique()
+        combined_df.attrs['latest_date'] = combined_df['date'].max()
+        
+        return combined_df, file_info_df
         
     except Exception as e:
         st.error(f"❌ Error loading data: {e}")
-        return pd.DataFrame()
+        return pd.DataFrame(), pd.DataFrame()
+
+def hash_dataframe(df):
+    """Hash a DataFrame's full contents for st.cache_data keys"""
+    row_hashes = pd.util.hash_pandas_object(df, index=True).values
+    return hashlib.blake2b(row_hashes.tobytes(), digest_size=16).digest()
+
+# Passed to cached functions that take small derived DataFrames. Functions that take
+# the full dataset skip hashing it (leading underscore) and key on data_key instead:
+# the (path, mtime, size) tuple of the loaded files.
+DATAFRAME_HASH_FUNCS = {pd.DataFrame: hash_dataframe}
 
 def show_overview_metrics(df):
-    """Display overview metrics"""
+    """Display overview metrics (precomputed by load_data_from_csv in df.attrs)"""
+    if df.empty:
+        return
+    
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric("Total Clients", len(df))
         
     with col2:
-        st.metric("Countries", df['country'].nunique())
+        st.metric("Countries", df.attrs['n_countries'])
         
     with col3:
-        st.metric("Cities", df['city'].nunique())
+        st.metric("Cities", df.attrs['n_cities'])
         
     with col4:
-        if not df.empty and 'date' in df.columns:
-            latest_date = df['date'].max()
-            if pd.notna(latest_date):
-                st.metric("Latest Entry", latest_date.strftime('%Y-%m-%d'))
+        latest_date = df.attrs['latest_date']
+        if pd.notna(latest_date):
+            st.metric("Latest Entry", latest_date.strftime('%Y-%m-%d'))
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def compute_country_stats(_df, data_key):
+    """Aggregate client and city counts per country (cached per loaded file set)"""
+    country_stats = _df.groupby('country', observed=True).agg({
+        'name': 'count',
+        'city': 'nunique'
+    }).rename(columns={'name': 'client_count', 'city': 'city_count'}).reset_index()
+    return country_stats.sort_values('client_count', ascending=False)
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES)
+def list_countries(_df, data_key):
+    """Sorted country names for the country filter (cached per loaded file set)"""
+    return sorted(_df['country'].unique().tolist())
 
-def show_country_distribution(df):
+@st.cache_data(show_spinner=False, max_entries=CITY_STATS_CACHE_ENTRIES)
+def compute_city_stats(_df, data_key, selected_country):
+    """Aggregate client counts per city, optionally restricted to one country"""
+    df = _df
+    if selected_country != 'All':
+        df = df[df['country'] == selected_country]
+    
+    city_stats = df.groupby(['country', 'city'], observed=True).agg({
+        'name': 'count',
+        'date': ['min', 'max'] if 'date' in df.columns else 'count'
+    }).reset_index()
+    
+    if 'date' in df.columns:
+        city_stats.columns = ['country', 'city', 'client_count', 'first_client_date', 'last_client_date']
+    else:
+        city_stats.columns = ['country', 'city', 'client_count']
+    
+    return city_stats.sort_values('client_count', ascending=False)
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES, hash_funcs=DATAFRAME_HASH_FUNCS)
+def create_country_map(country_stats):
+    """Build the world map figure (cached as a plain dict)"""
+    fig_map = px.choropleth(
+        country_stats,
+        locations='country',
+        locationmode='country names',
+        color='client_count',
+        hover_name='country',
+        hover_data={'client_count': True, 'city_count': True},
+        color_continuous_scale='Blues',
+        title="Global Client Distribution"
+    )
+    fig_map.update_layout(height=500)
+    return fig_map.to_dict()
+
+@st.cache_data(show_spinner=False, max_entries=DATASET_CACHE_ENTRIES, hash_funcs=DATAFRAME_HASH_FUNCS)
+def create_country_bar(country_stats):
+    """Build the top 10 countries bar chart (cached as a plain dict)"""
+    fig_bar = px.bar(
+        country_stats.head(10),
+        x='client_count',
+        y='country',
+        orientation='h',
+        title="Top 10 Countries",
+        color='client_count',
+        color_continuous_scale='Blues'
+    )
+    fig_bar.update_layout(height=500)
+    return fig_bar.to_dict()
+
+@st.cache_data(show_spinner=False, max_entries=CITY_STATS_CACHE_ENTRIES, hash_funcs=DATAFRAME_HASH_FUNCS)
+def create_city_bar(city_stats, title_suffix):
+    """Build the top 20 cities bar chart (cached as a plain dict)"""
+    fig_cities = px.bar(
+        city_stats.head(20),
+        x='client_count',
+        y='city',
+        orientation='h',
+        title=f"Client Distribution by Cities - {title_suffix}",
+        color='client_count',
+        color_continuous_scale='Viridis',
+        hover_data=['country']
+    )
+    fig_cities.update_layout(
+        height=600,
+        yaxis={'categoryorder': 'total ascending'}
+    )
+    return fig_cities.to_dict()
+
+def show_country_distribution(df, data_key):
     """Show country distribution page"""
     st.markdown("## 🌍 Client Distribution by Countries")
     
@@ -150,49 +312,25 @@ def show_country_distribution(df):
         return
     
     # Calculate country stats
-    country_stats = df.groupby('country').agg({
-        'name': 'count',
-        'city': 'nunique'
-    }).rename(columns={'name': 'client_count', 'city': 'city_count'}).reset_index()
-    country_stats = country_stats.sort_values('client_count', ascending=False)
+    country_stats = compute_country_stats(df, data_key)
     
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # World map visualization
-        fig_map = px.choropleth(
-            country_stats,
-            locations='country',
-            locationmode='country names',
-            color='client_count',
-            hover_name='country',
-            hover_data={'client_count': True, 'city_count': True},
-            color_continuous_scale='Blues',
-            title="Global Client Distribution"
-        )
-        fig_map.update_layout(height=500)
+        fig_map = go.Figure(create_country_map(country_stats))
         st.plotly_chart(fig_map, use_container_width=True)
         
     with col2:
         # Top countries bar chart
-        top_countries = country_stats.head(10)
-        fig_bar = px.bar(
-            top_countries,
-            x='client_count',
-            y='country',
-            orientation='h',
-            title="Top 10 Countries",
-            color='client_count',
-            color_continuous_scale='Blues'
-        )
-        fig_bar.update_layout(height=500)
+        fig_bar = go.Figure(create_country_bar(country_stats))
         st.plotly_chart(fig_bar, use_container_width=True)
     
     # Country statistics table
     st.markdown("### Country Statistics")
     st.dataframe(country_stats, use_container_width=True, hide_index=True)
 
-def show_city_distribution(df):
+def show_city_distribution(df, data_key):
     """Show city distribution page with country filter"""
     st.markdown("## 🏙️ Client Distribution by Cities")
     
@@ -201,58 +339,27 @@ def show_city_distribution(df):
         return
     
     # Country filter
-    countries = ['All'] + sorted(df['country'].unique().tolist())
+    countries = ['All'] + list_countries(df, data_key)
     selected_country = st.selectbox(
         "Select Country:",
         countries,
         key="country_filter"
     )
     
-    # Filter data based on selection
-    if selected_country == 'All':
-        filtered_df = df
-        title_suffix = "All Countries"
-    else:
-        filtered_df = df[df['country'] == selected_country]
-        title_suffix = selected_country
+    title_suffix = "All Countries" if selected_country == 'All' else selected_country
+    
+    # Calculate city stats for the selected country
+    city_stats = compute_city_stats(df, data_key, selected_country)
     
-    if filtered_df.empty:
+    if city_stats.empty:
         st.warning(f"No data available for {title_suffix}")
         return
     
-    # Calculate city stats
-    city_stats = filtered_df.groupby(['country', 'city']).agg({
-        'name': 'count',
-        'date': ['min', 'max'] if 'date' in filtered_df.columns else 'count'
-    }).reset_index()
-    
-    if 'date' in filtered_df.columns:
-        city_stats.columns = ['country', 'city', 'client_count', 'first_client_date', 'last_client_date']
-    else:
-        city_stats.columns = ['country', 'city', 'client_count']
-    
-    city_stats = city_stats.sort_values('client_count', ascending=False)
-    
     col1, col2 = st.columns([3, 1])
     
     with col1:
         # City distribution chart
-        top_cities = city_stats.head(20)
-        
-        fig_cities = px.bar(
-            top_cities,
-            x='client_count',
-            y='city',
-            orientation='h',
-            title=f"Client Distribution by Cities - {title_suffix}",
-            color='client_count',
-            color_continuous_scale='Viridis',
-            hover_data=['country']
-        )
-        fig_cities.update_layout(
-            height=600,
-            yaxis={'categoryorder': 'total ascending'}
-        )
+        fig_cities = go.Figure(create_city_bar(city_stats, title_suffix))
         st.plotly_chart(fig_cities, use_container_width=True)
         
     with col2:
@@ -275,10 +382,9 @@ def show_city_distribution(df):
 
 def show_file_info():
     """Show information about loaded CSV files"""
-    if 'file_info' in st.session_state:
+    if 'file_info_df' in st.session_state:
         st.markdown("### 📁 Loaded Files")
-        file_df = pd.DataFrame(st.session_state.file_info)
-        st.dataframe(file_df, use_container_width=True, hide_index=True)
+        st.dataframe(st.session_state.file_info_df, use_container_width=True, hide_index=True)
 
 def main():
     """Run the main dashboard"""
@@ -303,17 +409,25 @@ def main():
     
     # Load data
     with st.spinner("Loading data from CSV files..."):
-        df = load_data_from_csv()
+        input_files = get_input_files()
+        df, file_info_df = load_data_from_csv(input_files)
+    
+    # Store file info in session state
+    st.session_state.file_info_df = file_info_df
+    
+    # Auto-refresh: a fragment polls the input files and reruns the page on change
+    if auto_refresh:
+        watch_input_files(input_files)
     
     if df.empty:
         st.error("❌ No data available. Add CSV files to data/input directory!")
         st.markdown("""
         ### 📝 CSV Format Required:
         Your CSV files should have these columns:
-        - `name` (or `id`, `client_name`)
-        - `country`
-        - `city`
-        - `date`
+        - `name` (or `client_name`, `customer_name`, `full_name`)
+        - `country` (or `nation`, `country_name`)
+        - `city` (or `location`, `city_name`)
+        - `date` (or `timestamp`, `created_date`, `entry_date`)
         
         Example:
         ```
@@ -331,18 +445,13 @@ def main():
     
     # Show selected page
     if page == "Country Distribution":
-        show_country_distribution(df)
+        show_country_distribution(df, input_files)
     elif page == "City Distribution":
-        show_city_distribution(df)
+        show_city_distribution(df, input_files)
     
     # Show file information in sidebar
     with st.sidebar:
         show_file_info()
-    
-    # Auto-refresh
-    if auto_refresh:
-        time.sleep(10)
-        st.rerun()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file